@@ -5,23 +5,47 @@ import os
 import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
 
 from flask import Flask, jsonify, render_template, request
 
 import update_dne
 
 LOG_PATH = Path(os.getenv("DNE_LOG_PATH", "logs/dne_sync.log"))
+TAIL_CHUNK_SIZE = 64 * 1024
 
 app = Flask(__name__)
 
-status = {
-    "running": False,
-    "last_run": None,
-    "last_result": None,
-    "last_error": None,
-}
-status_lock = threading.Lock()
+
+# Leituras pegam a referência imutável atual sem lock; escritas trocam o
+# mapeamento inteiro sob um lock curto.
+class _AtomicStatus:
+    def __init__(self, **initial: Any) -> None:
+        self._current: Mapping[str, Any] = MappingProxyType(dict(initial))
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Mapping[str, Any]:
+        return self._current
+
+    def update(self, **changes: Any) -> None:
+        with self._lock:
+            self._current = MappingProxyType({**self._current, **changes})
+
+    def compare_and_update(self, expected: Mapping[str, Any], **changes: Any) -> bool:
+        with self._lock:
+            if any(self._current.get(key) != value for key, value in expected.items()):
+                return False
+            self._current = MappingProxyType({**self._current, **changes})
+            return True
+
+
+status = _AtomicStatus(
+    running=False,
+    last_run=None,
+    last_result=None,
+    last_error=None,
+)
 
 
 def build_logger() -> logging.Logger:
@@ -38,25 +62,16 @@ def build_logger() -> logging.Logger:
 
 def run_update(args: argparse.Namespace) -> None:
     logger = build_logger()
-    with status_lock:
-        status["running"] = True
-        status["last_run"] = datetime.utcnow().isoformat()
-        status["last_result"] = None
-        status["last_error"] = None
-
     try:
         logger.info("Iniciando sincronização via interface web.")
         update_dne.run_sync(args, logger)
-        with status_lock:
-            status["last_result"] = "success"
+        status.update(running=False, last_result="success")
     except Exception as exc:  # noqa: BLE001 - registro de erro é necessário aqui
         logger.exception("Erro durante sincronização: %s", exc)
-        with status_lock:
-            status["last_result"] = "failed"
-            status["last_error"] = str(exc)
-    finally:
-        with status_lock:
-            status["running"] = False
+        status.update(running=False, last_result="failed", last_error=str(exc))
+    except BaseException:
+        status.update(running=False)
+        raise
 
 
 def parse_args_from_env() -> argparse.Namespace:
@@ -65,9 +80,17 @@ def parse_args_from_env() -> argparse.Namespace:
 
 
 def tail_log(lines: int = 200) -> str:
-    if not LOG_PATH.exists():
+    if not LOG_PATH.exists() or lines <= 0:
         return ""
-    content = LOG_PATH.read_text(encoding="utf-8", errors="ignore").splitlines()
+    with LOG_PATH.open("rb") as handle:
+        position = handle.seek(0, os.SEEK_END)
+        data = b""
+        while position > 0 and data.count(b"\n") <= lines:
+            size = min(TAIL_CHUNK_SIZE, position)
+            position -= size
+            handle.seek(position)
+            data = handle.read(size) + data
+    content = data.decode("utf-8", errors="ignore").splitlines()
     return "\n".join(content[-lines:])
 
 
@@ -78,20 +101,29 @@ def index():
 
 @app.post("/run")
 def run():
-    with status_lock:
-        if status["running"]:
-            return jsonify({"status": "running"}), 409
-
     args = parse_args_from_env()
-    thread = threading.Thread(target=run_update, args=(args,), daemon=True)
-    thread.start()
+    started = status.compare_and_update(
+        {"running": False},
+        running=True,
+        last_run=datetime.utcnow().isoformat(),
+        last_result=None,
+        last_error=None,
+    )
+    if not started:
+        return jsonify({"status": "running"}), 409
+
+    try:
+        thread = threading.Thread(target=run_update, args=(args,), daemon=True)
+        thread.start()
+    except BaseException as exc:
+        status.update(running=False, last_result="failed", last_error=str(exc))
+        raise
     return jsonify({"status": "started"})
 
 
 @app.get("/status")
 def get_status():
-    with status_lock:
-        return jsonify(status)
+    return jsonify(dict(status.snapshot()))
 
 
 @app.get("/logs")
@@ -1,94 +1,224 @@
 #!/usr/bin/env python3
 import argparse
-import csv
+import functools
+import io
 import logging
+import multiprocessing
 import os
+import re
+import shutil
 import tempfile
 import zipfile
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Iterator, Optional
-from urllib.request import urlretrieve
+from typing import BinaryIO, Iterable, Iterator, Optional
+from urllib.request import Request, urlopen
 
 import mysql.connector
 
 DEFAULT_DNE_URL = "https://www2.correios.com.br/sistemas/edne/download/DNE_GU.zip"
+READ_BUFFER_SIZE = 1 << 20
+WRITE_BUFFER_SIZE = 1 << 20
+WRITE_CHUNK_ROWS = 10_000
+DOWNLOAD_TIMEOUT = 300
+RANGE_CHUNK_SIZE = 8 << 20
+LOAD_WORKERS = 4
+DB_DRIVERS = ("connector", "mysqlclient")
 
+# Linha de índice não único no SHOW CREATE TABLE (PRIMARY, UNIQUE, FULLTEXT e
+# SPATIAL ficam de fora e são mantidos durante a carga).
+_SECONDARY_INDEX_RE = re.compile(r"^\s*(?P<definition>KEY (?P<name>`(?:[^`]|``)+`) .*?),?$")
 
-@dataclass
-class DneRecord:
-    cep: str
-    street: str
-    city: str
-    region: str
-    neighborhood: str
 
+# (cep, street, city, region, neighborhood) em bytes latin1, na ordem das colunas do TSV.
+DneRecord = tuple[bytes, bytes, bytes, bytes, bytes]
 
-def normalize_spaces(value: str) -> str:
-    return " ".join(value.split())
 
+# Bytes que str.isspace() trata como espaço em latin1 mas bytes.split() não.
+_LATIN1_EXTRA_SPACES = b"\x1c\x1d\x1e\x1f\x85\xa0"
+_LATIN1_SPACES_TABLE = bytes.maketrans(_LATIN1_EXTRA_SPACES, b" " * len(_LATIN1_EXTRA_SPACES))
+_LATIN1_WHITESPACE = b" \t\n\r\x0b\x0c" + _LATIN1_EXTRA_SPACES
 
-def parse_logradouro_line(line: str) -> Optional[DneRecord]:
-    if not line or line[0] != "D":
-        return None
 
-    region = line[1:3].strip()
-    city = normalize_spaces(line[17:89])
-    neighborhood_initial = normalize_spaces(line[102:174])
-    neighborhood_final = normalize_spaces(line[187:259])
-    tipo_logradouro = normalize_spaces(line[259:285])
-    preposicao = normalize_spaces(line[285:288])
-    titulo = normalize_spaces(line[288:360])
-    nome_logradouro = normalize_spaces(line[374:446])
-    cep = line[518:526].strip()
+def normalize_spaces(value: bytes) -> bytes:
+    return b" ".join(value.translate(_LATIN1_SPACES_TABLE).split())
+
+
+# Cidade, bairro, tipo, preposição e título se repetem ao longo de milhões de
+# linhas; logradouro e CEP têm cardinalidade alta e ficam fora do cache.
+normalize_repeated = functools.lru_cache(maxsize=1 << 16)(normalize_spaces)
+
+# As 27 UFs, indexadas pelo recorte bruto: cada linha reaproveita o mesmo objeto.
+_regions: dict[bytes, bytes] = {}
+
 
+def parse_logradouro_line(line: bytes) -> Optional[DneRecord]:
+    if line[:1] != b"D":
+        return None
+
+    cep = line[518:526].strip(_LATIN1_WHITESPACE)
     if not cep:
         return None
 
-    neighborhood = neighborhood_initial or neighborhood_final
-    street_parts = [tipo_logradouro, preposicao, titulo, nome_logradouro]
-    street = normalize_spaces(" ".join(part for part in street_parts if part))
+    raw_region = line[1:3]
+    region = _regions.get(raw_region)
+    if region is None:
+        region = _regions[raw_region] = raw_region.strip(_LATIN1_WHITESPACE)
+    city = normalize_repeated(line[17:89])
+    neighborhood_initial = normalize_repeated(line[102:174])
+    neighborhood_final = normalize_repeated(line[187:259])
+    tipo_logradouro = normalize_repeated(line[259:285])
+    preposicao = normalize_repeated(line[285:288])
+    titulo = normalize_repeated(line[288:360])
+    nome_logradouro = normalize_spaces(line[374:446])
 
-    return DneRecord(
-        cep=cep,
-        street=street,
-        city=city,
-        region=region,
-        neighborhood=neighborhood,
-    )
+    neighborhood = neighborhood_initial if neighborhood_initial else neighborhood_final
+    # As partes já estão normalizadas; descartar as vazias basta para o espaçamento.
+    street = b" ".join(filter(None, (tipo_logradouro, preposicao, titulo, nome_logradouro)))
+
+    return (cep, street, city, region, neighborhood)
 
 
 def iter_logradouro_records(txt_path: Path) -> Iterator[DneRecord]:
-    with txt_path.open("r", encoding="latin1", errors="ignore") as handle:
+    with txt_path.open("rb", buffering=READ_BUFFER_SIZE) as handle:
+        parse_line = parse_logradouro_line
         for line in handle:
-            record = parse_logradouro_line(line.rstrip("\n"))
+            if line[:1] != b"D":
+                continue
+            record = parse_line(line.rstrip(b"\r\n"))
             if record:
                 yield record
 
 
+def parse_logradouro_file(task: tuple[Path, Path]) -> tuple[Path, int]:
+    txt_path, tsv_path = task
+    record_count = 0
+    with tsv_path.open("wb", buffering=WRITE_BUFFER_SIZE) as handle:
+        chunk: list[bytes] = []
+        append = chunk.append
+        join_fields = b"\t".join
+        for record in iter_logradouro_records(txt_path):
+            append(join_fields(record))
+            if len(chunk) >= WRITE_CHUNK_ROWS:
+                handle.write(b"\n".join(chunk) + b"\n")
+                record_count += len(chunk)
+                chunk.clear()
+        if chunk:
+            handle.write(b"\n".join(chunk) + b"\n")
+            record_count += len(chunk)
+    return tsv_path, record_count
+
+
+class HttpRangeReader(io.RawIOBase):
+    def __init__(self, url: str, size: int) -> None:
+        self.url = url
+        self.size = size
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = self.size + offset
+        else:
+            raise ValueError(f"whence inválido: {whence}")
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        if self.position >= self.size:
+            return 0
+        end = min(self.position + len(buffer), self.size) - 1
+        whole_file = self.position == 0 and end == self.size - 1
+        request = Request(self.url, headers={"Range": f"bytes={self.position}-{end}"})
+        with urlopen(request, timeout=DOWNLOAD_TIMEOUT) as response:
+            if response.status != 206 and not (response.status == 200 and whole_file):
+                raise OSError(f"Servidor ignorou o cabeçalho Range (HTTP {response.status}).")
+            data = response.read()
+        count = len(data)
+        buffer[:count] = data
+        self.position += count
+        return count
+
+
+def open_dne_zip(url: str) -> BinaryIO:
+    # Sonda com um GET parcial: alguns servidores anunciam Accept-Ranges no
+    # HEAD mas respondem 200 com o arquivo inteiro a um GET com Range.
+    probe = Request(url, headers={"Range": "bytes=0-0"})
+    with urlopen(probe, timeout=DOWNLOAD_TIMEOUT) as response:
+        total_size = response.headers.get("Content-Range", "").rpartition("/")[2]
+        # Com Range, o ZipFile lê só o diretório central e a entrada do ZIP interno.
+        if response.status == 206 and total_size.isdigit():
+            return io.BufferedReader(
+                HttpRangeReader(response.url, int(total_size)), buffer_size=RANGE_CHUNK_SIZE
+            )
+        if response.status == 200:
+            main_buffer = io.BytesIO()
+            shutil.copyfileobj(response, main_buffer, READ_BUFFER_SIZE)
+            main_buffer.seek(0)
+            return main_buffer
+
+    main_buffer = io.BytesIO()
+    with urlopen(url, timeout=DOWNLOAD_TIMEOUT) as response:
+        shutil.copyfileobj(response, main_buffer, READ_BUFFER_SIZE)
+    main_buffer.seek(0)
+    return main_buffer
+
+
+def open_nested_zip(main_zip: zipfile.ZipFile, name: str, in_memory: bool) -> BinaryIO:
+    # Entradas sem compressão de um ZIP já em memória têm seek barato: o ZIP
+    # interno é lido direto do externo, sem uma segunda cópia.
+    if in_memory and main_zip.getinfo(name).compress_type == zipfile.ZIP_STORED:
+        return main_zip.open(name)
+    return io.BytesIO(main_zip.read(name))
+
+
 def download_and_extract(url: str, temp_dir: Path) -> list[Path]:
-    zip_path = temp_dir / "dne.zip"
-    urlretrieve(url, zip_path)
+    main_source = open_dne_zip(url)
+    in_memory = isinstance(main_source, io.BytesIO)
 
-    with zipfile.ZipFile(zip_path) as main_zip:
+    logradouro_files: list[Path] = []
+    with main_source, zipfile.ZipFile(main_source) as main_zip:
         nested_name = next(
             name for name in main_zip.namelist() if name.startswith("DNE_GU_") and name.endswith(".zip")
         )
-        nested_path = temp_dir / nested_name
-        nested_path.write_bytes(main_zip.read(nested_name))
-
-    logradouro_files: list[Path] = []
-    with zipfile.ZipFile(nested_path) as nested_zip:
-        for name in nested_zip.namelist():
-            if name.endswith("_LOGRADOUROS.TXT"):
-                extracted = temp_dir / Path(name).name
-                extracted.write_bytes(nested_zip.read(name))
-                logradouro_files.append(extracted)
+        with open_nested_zip(main_zip, nested_name, in_memory) as nested_source:
+            with zipfile.ZipFile(nested_source) as nested_zip:
+                for name in nested_zip.namelist():
+                    if name.endswith("_LOGRADOUROS.TXT"):
+                        extracted = temp_dir / Path(name).name
+                        with nested_zip.open(name) as source, extracted.open("wb") as target:
+                            shutil.copyfileobj(source, target, READ_BUFFER_SIZE)
+                        logradouro_files.append(extracted)
 
     return logradouro_files
 
 
 def mysql_connect(args: argparse.Namespace):
+    if args.db_driver == "mysqlclient":
+        # Opcional: o mysqlclient compila contra a libmysqlclient, que envia o
+        # LOAD DATA LOCAL INFILE direto do C.
+        import MySQLdb
+
+        return MySQLdb.connect(
+            host=args.db_host,
+            user=args.db_user,
+            password=args.db_password,
+            database=args.db_name,
+            port=args.db_port,
+            autocommit=False,
+            local_infile=1,
+        )
     return mysql.connector.connect(
         host=args.db_host,
         user=args.db_user,
@@ -100,53 +230,169 @@ def mysql_connect(args: argparse.Namespace):
     )
 
 
-def sync_database(csv_path: Path, args: argparse.Namespace, logger: logging.Logger) -> None:
+def secondary_indexes(cursor, table: str) -> list[tuple[str, str]]:
+    # Reaproveita a definição exata do SHOW CREATE TABLE (índices funcionais,
+    # DESC, INVISIBLE e COMMENT inclusos) em vez de remontá-la.
+    cursor.execute(f"SHOW CREATE TABLE {table}")
+    _, create_table = cursor.fetchone()
+    indexes: list[tuple[str, str]] = []
+    for line in create_table.splitlines():
+        match = _SECONDARY_INDEX_RE.match(line)
+        if match:
+            indexes.append((match.group("name"), match.group("definition")))
+    return indexes
+
+
+def load_tsv(cursor, tsv_path: Path, table: str) -> int:
+    cursor.execute(
+        f"""
+        LOAD DATA LOCAL INFILE %s
+        INTO TABLE {table}
+        CHARACTER SET latin1
+        FIELDS TERMINATED BY '\t'
+        LINES TERMINATED BY '\n'
+        (cep, street, city, region, neighborhood)
+        """,
+        (str(tsv_path),),
+    )
+    return cursor.rowcount
+
+
+def load_parts(
+    parts: Iterable[tuple[Path, int]],
+    table: str,
+    session_settings: str,
+    args: argparse.Namespace,
+    logger: logging.Logger,
+) -> int:
+    def load_part(part_path: Path) -> int:
+        with mysql_connect(args) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(session_settings)
+                loaded = load_tsv(cursor, part_path, table)
+            conn.commit()
+        return loaded
+
+    # Cada UF vira um LOAD DATA em conexão própria assim que o pool termina
+    # de gerar o arquivo, sobrepondo parsing e carga.
+    record_count = 0
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as executor:
+        futures = []
+        for part_path, part_count in parts:
+            record_count += part_count
+            futures.append(executor.submit(load_part, part_path))
+        logger.info("Registros processados: %s", record_count)
+        return sum(future.result() for future in futures)
+
+
+def sync_incremental(
+    conn,
+    parts: Iterable[tuple[Path, int]],
+    args: argparse.Namespace,
+    logger: logging.Logger,
+) -> None:
     stage_table = f"{args.table}_stage"
 
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {stage_table}")
+        cursor.execute(
+            f"""
+            CREATE TABLE {stage_table} (PRIMARY KEY (cep))
+            SELECT cep, street, city, region, neighborhood
+            FROM {args.table}
+            LIMIT 0
+            """
+        )
+        load_parts(
+            parts,
+            stage_table,
+            "SET SESSION unique_checks = 0, foreign_key_checks = 0",
+            args,
+            logger,
+        )
+        logger.info("Carga na tabela de estágio concluída.")
+        cursor.execute(
+            f"""
+            INSERT INTO {args.table} (cep, street, city, region, neighborhood)
+            SELECT stage.cep, stage.street, stage.city, stage.region, stage.neighborhood
+            FROM {stage_table} stage
+            LEFT JOIN {args.table} target ON target.cep = stage.cep
+            WHERE target.cep IS NULL
+            """
+        )
+        inserted = cursor.rowcount
+        logger.info("Novos CEPs inseridos: %s", inserted)
+        cursor.execute(
+            f"""
+            DELETE target
+            FROM {args.table} target
+            LEFT JOIN {stage_table} stage ON stage.cep = target.cep
+            WHERE stage.cep IS NULL
+            """
+        )
+        deleted = cursor.rowcount
+        logger.info("CEPs removidos: %s", deleted)
+    conn.commit()
+
+
+def sync_swap(
+    conn,
+    parts: Iterable[tuple[Path, int]],
+    args: argparse.Namespace,
+    logger: logging.Logger,
+) -> None:
+    new_table = f"{args.table}_new"
+    old_table = f"{args.table}_old"
+
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {new_table}")
+        cursor.execute(f"CREATE TABLE {new_table} LIKE {args.table}")
+        indexes = secondary_indexes(cursor, new_table)
+        if indexes:
+            drops = ", ".join(f"DROP INDEX {name}" for name, _ in indexes)
+            cursor.execute(f"ALTER TABLE {new_table} {drops}")
+        loaded = load_parts(parts, new_table, "SET SESSION foreign_key_checks = 0", args, logger)
+        logger.info("Carga na nova tabela concluída: %s CEPs.", loaded)
+        if indexes:
+            adds = ", ".join(f"ADD {definition}" for _, definition in indexes)
+            cursor.execute(f"ALTER TABLE {new_table} {adds}")
+            logger.info("Índices secundários recriados.")
+        cursor.execute(f"DROP TABLE IF EXISTS {old_table}")
+        cursor.execute(
+            f"RENAME TABLE {args.table} TO {old_table}, {new_table} TO {args.table}"
+        )
+        cursor.execute(f"DROP TABLE {old_table}")
+
+
+def sync_database(
+    parts: Iterable[tuple[Path, int]],
+    args: argparse.Namespace,
+    logger: logging.Logger,
+) -> None:
     with mysql_connect(args) as conn:
-        with conn.cursor() as cursor:
-            cursor.execute(
-                f"""
-                CREATE TABLE IF NOT EXISTS {stage_table} LIKE {args.table}
-                """
-            )
-            cursor.execute(f"TRUNCATE TABLE {stage_table}")
-            cursor.execute(
-                f"""
-                LOAD DATA LOCAL INFILE %s
-                INTO TABLE {stage_table}
-                FIELDS TERMINATED BY '\t'
-                LINES TERMINATED BY '\n'
-                (cep, street, city, region, neighborhood)
-                """,
-                (str(csv_path),),
-            )
-            logger.info("Carga na tabela de estágio concluída.")
-            cursor.execute(
-                f"""
-                INSERT INTO {args.table} (cep, street, city, region, neighborhood)
-                SELECT stage.cep, stage.street, stage.city, stage.region, stage.neighborhood
-                FROM {stage_table} stage
-                LEFT JOIN {args.table} target ON target.cep = stage.cep
-                WHERE target.cep IS NULL
-                """
-            )
-            inserted = cursor.rowcount
-            logger.info("Novos CEPs inseridos: %s", inserted)
-            cursor.execute(
-                f"""
-                DELETE target
-                FROM {args.table} target
-                LEFT JOIN {stage_table} stage ON stage.cep = target.cep
-                WHERE stage.cep IS NULL
-                """
-            )
-            deleted = cursor.rowcount
-            logger.info("CEPs removidos: %s", deleted)
-        conn.commit()
+        if args.incremental:
+            sync_incremental(conn, parts, args, logger)
+        else:
+            sync_swap(conn, parts, args, logger)
         logger.info("Sincronização concluída com sucesso.")
 
 
+def env_flag(name: str) -> bool:
+    value = os.getenv(name, "").strip().lower()
+    if value in ("", "0", "false", "no", "off"):
+        return False
+    if value in ("1", "true", "yes", "on"):
+        return True
+    raise ValueError(f"Valor inválido para {name}: {value!r} (use 1/0, true/false, yes/no ou on/off).")
+
+
+def env_choice(name: str, choices: tuple[str, ...], default: str) -> str:
+    value = (os.getenv(name) or default).strip().lower()
+    if value not in choices:
+        raise ValueError(f"Valor inválido para {name}: {value!r} (use {', '.join(choices)}).")
+    return value
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Baixa o DNE dos Correios, gera CSV e sincroniza com o MySQL."
@@ -157,7 +403,19 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument("--db-password", default=os.getenv("DNE_DB_PASSWORD", ""))
     parser.add_argument("--db-name", default=os.getenv("DNE_DB_NAME", ""))
     parser.add_argument("--db-port", type=int, default=int(os.getenv("DNE_DB_PORT", "3306")))
+    parser.add_argument(
+        "--db-driver",
+        choices=DB_DRIVERS,
+        default=env_choice("DNE_DB_DRIVER", DB_DRIVERS, "connector"),
+        help="Driver MySQL: mysql-connector-python (padrão) ou mysqlclient.",
+    )
     parser.add_argument("--table", default=os.getenv("DNE_TABLE", "postcode_correios"))
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=env_flag("DNE_INCREMENTAL"),
+        help="Aplica apenas INSERT/DELETE na tabela existente em vez de trocá-la por uma nova.",
+    )
     parser.add_argument("--keep-temp", action="store_true", help="Mantém arquivos temporários.")
     return parser
 
@@ -168,25 +426,13 @@ def run_sync(args: argparse.Namespace, logger: logging.Logger) -> None:
         logger.info("Baixando DNE de %s", args.dne_url)
         logradouro_files = download_and_extract(args.dne_url, temp_path)
 
-        csv_path = temp_path / "dne_logradouros.tsv"
-        record_count = 0
-        with csv_path.open("w", newline="", encoding="utf-8") as handle:
-            writer = csv.writer(handle, delimiter="\t")
-            for logradouro_file in logradouro_files:
-                for record in iter_logradouro_records(logradouro_file):
-                    writer.writerow(
-                        [
-                            record.cep,
-                            record.street,
-                            record.city,
-                            record.region,
-                            record.neighborhood,
-                        ]
-                    )
-                    record_count += 1
-
-        logger.info("Registros processados: %s", record_count)
-        sync_database(csv_path, args, logger)
+        tasks = [
+            (logradouro_file, temp_path / f"part_{index}.tsv")
+            for index, logradouro_file in enumerate(logradouro_files)
+        ]
+        with multiprocessing.Pool() as pool:
+            parts = pool.imap_unordered(parse_logradouro_file, tasks)
+            sync_database(parts, args, logger)
 
         if args.keep_temp:
             keep_path = Path.cwd() / "dne_tmp"